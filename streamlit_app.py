@@ -1,67 +1,170 @@
 import streamlit as st
 from snowflake.snowpark.context import get_active_session
 import pandas as pd
+import numpy as np
+import pyarrow as pa
 import json
 import tempfile
-from io import StringIO, BytesIO
+from io import BytesIO
 from datetime import datetime
 import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any, Optional,Tuple
 
-def validate_schema_match(df: pd.DataFrame, schema: Dict) -> Tuple[bool, List[str]]:
+def _schema_to_dict(schema: pd.DataFrame) -> Dict[str, Dict]:
     """
-    Validate if DataFrame matches schema definition.
-    Returns (is_valid, list_of_issues)
+    Convert _get_schema_metadata rows into {column: {"type", "nullable"}}.
+    Nullability comes from the precomputed _NULLABLE_BOOL column.
+    """
+    return {
+        name: {"type": data_type, "nullable": bool(is_nullable)}
+        for name, data_type, is_nullable in zip(
+            schema["COLUMN_NAME"].values, schema["DATA_TYPE"].values, schema["_NULLABLE_BOOL"].values
+        )
+    }
+
+
+def _parse_datetime(col_data: pd.Series) -> pd.Series:
+    """
+    Parse a column as datetimes, unparseable values become NaT.
+    Tries the app's "YYYY-MM-DD HH:mm:ss" format first so the common case
+    skips per-value format inference.
+    """
+    parsed = pd.to_datetime(col_data, format="%Y-%m-%d %H:%M:%S", errors='coerce', cache=True)
+    if (parsed.isna() & col_data.notna()).any():
+        parsed = pd.to_datetime(col_data, errors='coerce', cache=True)
+    return parsed
+
+
+def _find_schema_issues(df: pd.DataFrame, schema_columns: Dict[str, Dict],
+                        check_nulls: bool = True, check_extra: bool = True) -> List[str]:
+    """
+    Check DataFrame against {column: {"type", "nullable"}}.
+    Columns are probed together per data type rather than one at a time.
+    Returns list_of_issues
     """
     issues = []
 
-    # Get schema columns
-    schema_columns = {
-        row["COLUMN_NAME"]: {
-            "type": row["DATA_TYPE"],
-            "nullable": row["IS_NULLABLE"].strip().upper() == "YES"
-        }
-        for _, row in schema.iterrows()
-    }
+    # The pyarrow reader keeps repeated headers as-is; per-column checks need unique names
+    if df.columns.has_duplicates:
+        duplicate_cols = df.columns[df.columns.duplicated()].unique()
+        issues.append(f"Duplicate columns found: {', '.join(map(str, duplicate_cols))}")
+        return issues
+
+    present = [col for col in schema_columns if col in df.columns]
+    int_cols = [col for col in present if schema_columns[col]['type'] == 'INTEGER']
+    float_cols = [col for col in present if schema_columns[col]['type'] == 'FLOAT']
+    datetime_cols = [col for col in present if schema_columns[col]['type'] == 'DATETIME']
+
+    invalid = pd.Series(False, index=present, dtype=bool)
+    non_integer = pd.Series(False, index=present, dtype=bool)
+
+    # Null mask computed once and shared by the type and nullability checks
+    not_null = df[present].notna()
+
+    # Numeric columns: anything non-null that fails to coerce is invalid
+    numeric_cols = int_cols + float_cols
+    if numeric_cols:
+        numeric = df[numeric_cols].apply(pd.to_numeric, errors='coerce')
+
+        # Check on a float64 block: Arrow-backed columns coerce bad values to NaN, not NA
+        vals = numeric.to_numpy(dtype='float64', na_value=np.nan)
+        mask = not_null[numeric_cols].to_numpy()
+        invalid[numeric_cols] = (np.isnan(vals) & mask).any(axis=0)
+
+        if int_cols:
+            # One ufunc sweep over the INTEGER columns, reduced per column
+            int_vals = vals[:, :len(int_cols)]
+            non_integer[int_cols] = ((int_vals != np.trunc(int_vals)) & mask[:, :len(int_cols)]).any(axis=0)
+
+    if datetime_cols:
+        parsed = df[datetime_cols].apply(_parse_datetime)
+        invalid[datetime_cols] = (parsed.isna() & not_null[datetime_cols]).any()
+
+    has_nulls = ~not_null.all()
 
-    # Check if all required columns are present
     for col_name, col_info in schema_columns.items():
         if col_name not in df.columns:
             issues.append(f"Missing required column: {col_name}")
             continue
 
-        # Check data type
-        col_data = df[col_name]
-        try:
-            if col_info['type'] == 'INTEGER':
-                # Try converting to numeric and check if all are integers
-                numeric_data = pd.to_numeric(col_data.dropna())
-                if not all(numeric_data.astype(int) == numeric_data):
-                    issues.append(f"Column '{col_name}' contains non-integer values")
-
-            elif col_info['type'] == 'FLOAT':
-                # Try converting to numeric
-                pd.to_numeric(col_data.dropna())
-
-            elif col_info['type'] == 'DATETIME':
-                # Try converting to datetime
-                pd.to_datetime(col_data.dropna())
-
-        except Exception:
+        if invalid[col_name]:
             issues.append(f"Column '{col_name}' contains invalid {col_info['type']} values")
+        elif non_integer[col_name]:
+            issues.append(f"Column '{col_name}' contains non-integer values")
 
-        # Check for null values
-        if not col_info.get('nullable', False) and col_data.isnull().any():
+        if check_nulls and not col_info.get('nullable', False) and has_nulls[col_name]:
             issues.append(f"Column '{col_name}' contains null values which are not allowed")
 
     # Check for extra columns in the dataframe
-    extra_cols = set(df.columns) - set(schema_columns.keys())
-    if extra_cols:
-        issues.append(f"Extra columns found: {', '.join(extra_cols)}")
+    if check_extra:
+        extra_cols = df.columns.difference(schema_columns.keys(), sort=False)
+        if len(extra_cols):
+            issues.append(f"Extra columns found: {', '.join(extra_cols)}")
+
+    return issues
+
 
+def validate_schema_match(df: pd.DataFrame, schema_columns: Dict[str, Dict]) -> Tuple[bool, List[str]]:
+    """
+    Validate if DataFrame matches schema definition.
+    Returns (is_valid, list_of_issues)
+    """
+    issues = _find_schema_issues(df, schema_columns)
     return len(issues) == 0, issues
 
 
+@st.cache_data(ttl=300, max_entries=64)
+def _get_schema_metadata(schema_name: str) -> pd.DataFrame:
+    """
+    Fetch external tables and their columns for a schema in one round-trip.
+    Cached across reruns.
+    """
+    session = get_active_session()
+
+    query = """
+    WITH tables AS (
+        SELECT TABLE_NAME
+        FROM INFORMATION_SCHEMA.TABLES
+        WHERE TABLE_TYPE = 'EXTERNAL TABLE'
+          AND TABLE_SCHEMA = ?
+    ),
+    columns AS (
+        SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE, IS_NULLABLE, ORDINAL_POSITION
+        FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = ?
+          AND COLUMN_NAME != 'VALUE'
+    )
+    SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE, IS_NULLABLE
+    FROM tables
+    LEFT JOIN columns USING (TABLE_NAME)
+    ORDER BY TABLE_NAME, ORDINAL_POSITION
+    """
+
+    metadata = session.sql(query, params=[schema_name, schema_name]).to_pandas()
+
+    # Normalize IS_NULLABLE once per fetch rather than per validation
+    metadata['_NULLABLE_BOOL'] = metadata['IS_NULLABLE'].str.strip().str.upper().eq('YES')
+    return metadata
+
+
+def _list_external_tables(schema_name: str) -> List[str]:
+    """Return external table names in a schema."""
+    metadata = _get_schema_metadata(schema_name)
+    return metadata['TABLE_NAME'].drop_duplicates().tolist()
+
+
+def _get_table_schema(schema_name: str, table_name: str) -> Tuple[pd.DataFrame, Dict[str, Dict]]:
+    """
+    Return column definitions for an external table.
+    Returns (schema_for_display, schema_columns)
+    """
+    metadata = _get_schema_metadata(schema_name)
+    columns = metadata[(metadata['TABLE_NAME'] == table_name) & metadata['COLUMN_NAME'].notna()]
+    schema = columns[['COLUMN_NAME', 'DATA_TYPE', 'IS_NULLABLE']].reset_index(drop=True)
+    return schema, _schema_to_dict(columns)
+
+
 def upload_page():
     """File upload interface with schema validation."""
     
@@ -82,19 +185,8 @@ def upload_page():
     if not schema_name:
         return
 
-    # Query to get external table names
-    query = f"""
-        SELECT TABLE_NAME
-        FROM INFORMATION_SCHEMA.TABLES
-        WHERE TABLE_TYPE = 'EXTERNAL TABLE'
-          AND TABLE_SCHEMA = '{schema_name}'
-    """
-    
-    # Run the query
-    df = session.sql(query).to_pandas()
-    
-    # Convert to a Python list
-    external_tables = df['TABLE_NAME'].tolist()
+    # Get external table names
+    external_tables = _list_external_tables(schema_name)
 
     # File type selection
     table_name = st.sidebar.selectbox(
@@ -107,15 +199,7 @@ def upload_page():
         return
 
     # Display schema information
-    query = f"""
-    SELECT COLUMN_NAME, DATA_TYPE, IS_NULLABLE
-    FROM INFORMATION_SCHEMA.COLUMNS
-    WHERE TABLE_SCHEMA = '{schema_name}'
-      AND TABLE_NAME = '{table_name}'
-      AND COLUMN_NAME != 'VALUE'
-    """
-
-    schema = session.sql(query).to_pandas()
+    schema, schema_columns = _get_table_schema(schema_name, table_name)
 
     st.text("Expected File Schema:")
     st.dataframe(schema, use_container_width=True)
@@ -129,12 +213,19 @@ def upload_page():
 
     if uploaded_file:
         try:
-            # Read the CSV file
-            df = pd.read_csv(uploaded_file)
-            
+            # Read the CSV file with Arrow's multithreaded parser, typed from the schema
+            dtype_map = {"INTEGER": "Int64", "FLOAT": "Float64"}
+            dtypes = {col: dtype_map[info['type']] for col, info in schema_columns.items() if info['type'] in dtype_map}
+            parse_dates = [col for col, info in schema_columns.items() if info['type'] == 'DATETIME']
+            try:
+                df = pd.read_csv(uploaded_file, engine="pyarrow", dtype=dtypes, parse_dates=parse_dates)
+            except (ValueError, KeyError):
+                # Values or columns don't fit the schema; read untyped so validation can report them
+                uploaded_file.seek(0)
+                df = pd.read_csv(uploaded_file, engine="pyarrow")
 
             # Validate schema
-            is_valid, issues = validate_schema_match(df, schema)
+            is_valid, issues = validate_schema_match(df, schema_columns)
 
             if not is_valid:
                 st.error("❌ Schema validation failed:")
@@ -150,19 +241,22 @@ def upload_page():
             # Upload button
             if st.button("Upload File"):
                 try:
-                    s3 = S3Handler()
+                    s3 = _get_s3()
                     file_path = f"{schema_name.lower()}/{table_name.lower()}/{table_name.lower()}.csv"
 
                     # Check if file exists and create backup if needed
                     if s3.file_exists(file_path):
                         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                         backup_path = f"{schema_name.lower()}/{table_name.lower()}/archive/{table_name.lower()}_{timestamp}.csv"
-                        s3.rename_file(file_path, backup_path)
+                        if not s3.backup_file(file_path, backup_path):
+                            st.error("Upload cancelled: the existing file could not be backed up")
+                            return
                         st.info(f"📁 Existing file backed up with timestamp")
 
                     # Upload new file
                     uploaded_file.seek(0)
                     s3.upload_file(uploaded_file, file_path)
+                    st.session_state.pop('editor_file', None)
                     st.success("✨ File uploaded successfully!")
 
                     # Show file details
@@ -231,45 +325,12 @@ def get_column_config(df, schema):
     return column_config
 
 
-def check_file_schema_compatibility(df: pd.DataFrame, schema: Dict) -> Tuple[bool, List[str]]:
+def check_file_schema_compatibility(df: pd.DataFrame, schema_columns: Dict[str, Dict]) -> Tuple[bool, List[str]]:
     """
     Check if file's current schema matches with the selected file type schema.
     Returns (is_compatible, list_of_issues)
     """
-    issues = []
-
-    # Get schema columns
-    schema_columns = {
-        row["COLUMN_NAME"]: {
-            "type": row["DATA_TYPE"],
-            "nullable": row["IS_NULLABLE"].strip().upper() == "YES"
-        }
-        for _, row in schema.iterrows()
-    }
-
-    # Check if all schema columns are present
-    for col_name, col_info in schema_columns.items():
-        if col_name not in df.columns:
-            issues.append(f"Missing column: {col_name}")
-            continue
-
-        # Basic type compatibility check
-        col_data = df[col_name]
-        try:
-            if col_info['type'] == 'INTEGER':
-                pd.to_numeric(col_data.dropna(), downcast='integer')
-            elif col_info['type'] == 'FLOAT':
-                pd.to_numeric(col_data.dropna(), downcast='float')
-            elif col_info['type'] == 'DATETIME':
-                pd.to_datetime(col_data.dropna())
-        except:
-            issues.append(f"Column '{col_name}' has incompatible data type")
-
-    # Check for extra columns
-    extra_cols = set(df.columns) - set(schema_columns.keys())
-    if extra_cols:
-        issues.append(f"Extra columns found: {', '.join(extra_cols)}")
-
+    issues = _find_schema_issues(df, schema_columns, check_nulls=False)
     return len(issues) == 0, issues
 
 
@@ -280,7 +341,7 @@ def manage_files_page():
     # Get Snowflake session
     session = get_active_session()
 
-    s3 = S3Handler()
+    s3 = _get_s3()
 
     available_schemas = ["PUBLIC"]
 
@@ -295,19 +356,8 @@ def manage_files_page():
     if not schema_name:
         return
 
-    # Query to get external table names
-    query = f"""
-        SELECT TABLE_NAME
-        FROM INFORMATION_SCHEMA.TABLES
-        WHERE TABLE_TYPE = 'EXTERNAL TABLE'
-          AND TABLE_SCHEMA = '{schema_name}'
-    """
-    
-    # Run the query
-    df = session.sql(query).to_pandas()
-    
-    # Convert to a Python list
-    external_tables = df['TABLE_NAME'].tolist()
+    # Get external table names
+    external_tables = _list_external_tables(schema_name)
 
     # File type selection
     table_name = st.sidebar.selectbox(
@@ -321,20 +371,13 @@ def manage_files_page():
         return
 
     # Display schema information
-    query = f"""
-    SELECT COLUMN_NAME, DATA_TYPE, IS_NULLABLE
-    FROM INFORMATION_SCHEMA.COLUMNS
-    WHERE TABLE_SCHEMA = '{schema_name}'
-      AND TABLE_NAME = '{table_name}'
-      AND COLUMN_NAME != 'VALUE'
-    """
-
-    schema = session.sql(query).to_pandas()
+    schema, schema_columns = _get_table_schema(schema_name, table_name)
 
     st.text("Expected File Schema:")
     st.dataframe(schema, use_container_width=True)
 
-    all_files = s3.list_files(f"{schema_name.lower()}/{table_name.lower()}")
+    file_versions = s3.list_file_versions(f"{schema_name.lower()}/{table_name.lower()}")
+    all_files = list(file_versions)
     csv_files = [f for f in all_files
                  if f.lower().endswith('.csv') and
                  not f.startswith(f"{schema_name.lower()}/{table_name.lower()}/archive/")]
@@ -343,12 +386,16 @@ def manage_files_page():
         st.info("No files found for this file type")
         return
 
+    # Download files concurrently; each is still fetched whole, only its parse is capped
+    with ThreadPoolExecutor(max_workers=min(8, len(csv_files))) as executor:
+        futures = [executor.submit(s3.get_file, file_path, probe=True) for file_path in csv_files]
+
     # Check schema compatibility for each file
     compatible_files = []
-    for file_path in csv_files:
+    for file_path, future in zip(csv_files, futures):
         try:
-            df = s3.get_file(file_path)
-            is_compatible, _ = check_file_schema_compatibility(df, schema)
+            df = future.result()
+            is_compatible, _ = check_file_schema_compatibility(df, schema_columns)
             if is_compatible:
                  compatible_files.append(file_path)
         except Exception as e:
@@ -368,11 +415,17 @@ def manage_files_page():
 
     if selected_file:
         try:
-            # Load file
-            df = s3.get_file(selected_file)
+            # Load file once per selection and version; pagination reruns reuse the Arrow table,
+            # and a change to the stored file (md5 from this rerun's LIST) forces a reload
+            editor_key = (selected_file, file_versions.get(selected_file))
+            if st.session_state.get('editor_file') != editor_key:
+                df = s3.get_file(selected_file)
+                st.session_state.editor_table = pa.Table.from_pandas(df, preserve_index=False)
+                st.session_state.editor_file = editor_key
+            table = st.session_state.editor_table
 
             # Display file information
-            st.info(f"File contains {len(df):,} rows and {len(df.columns):,} columns")
+            st.info(f"File contains {table.num_rows:,} rows and {table.num_columns:,} columns")
 
             # Create editor container
             with st.container():
@@ -381,13 +434,17 @@ def manage_files_page():
 
                 # Pagination for editor
                 rows_per_page = st.slider("Rows per page", 5, 50, 10)
-                page = st.number_input("Page", 1, (len(df) // rows_per_page) + 1, 1)
+                page = st.number_input("Page", 1, (table.num_rows // rows_per_page) + 1, 1)
                 start_idx = (page - 1) * rows_per_page
-                end_idx = min(start_idx + rows_per_page, len(df))
+                end_idx = min(start_idx + rows_per_page, table.num_rows)
+
+                # Arrow slice is zero-copy; only the visible page becomes a DataFrame
+                page_df = table.slice(start_idx, rows_per_page).to_pandas(types_mapper=pd.ArrowDtype)
+                page_df.index = pd.RangeIndex(start_idx, end_idx)
 
                 # Data editor
                 edited_df = st.data_editor(
-                    df.iloc[start_idx:end_idx],
+                    page_df,
                     num_rows="dynamic",
                     use_container_width=True,
                     key="editor"
@@ -395,8 +452,11 @@ def manage_files_page():
 
                 # Save changes button
                 if st.button("Save Changes", type="primary"):
-                    # Validate changes
-                    is_valid, issues = validate_schema_match(edited_df, schema)
+                    # Validate only rows the editor reports as edited or added
+                    editor_state = st.session_state.get("editor", {})
+                    edited_labels = page_df.index[[int(pos) for pos in editor_state.get("edited_rows", {})]]
+                    changed = edited_df.index.isin(edited_labels) | ~edited_df.index.isin(page_df.index)
+                    is_valid, issues = validate_schema_match(edited_df[changed], schema_columns)
 
                     if not is_valid:
                         st.error("❌ Validation failed:")
@@ -408,15 +468,17 @@ def manage_files_page():
                         # Backup existing file
                         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                         backup_path = f"{schema_name.lower()}/{table_name.lower()}/archive/{table_name.lower()}_{timestamp}.csv"
-                        s3.rename_file(selected_file, backup_path)
+                        if not s3.backup_file(selected_file, backup_path):
+                            st.error("Save cancelled: the existing file could not be backed up")
+                            return
 
                         # Save changes
-                        csv_buffer = StringIO()
+                        csv_buffer = BytesIO()
                         edited_df.to_csv(csv_buffer, index=False)
-                        s3.upload_file(
-                            BytesIO(csv_buffer.getvalue().encode()),
-                            selected_file
-                        )
+                        s3.upload_file(csv_buffer, selected_file)
+
+                        # Reload the saved file on the next rerun
+                        st.session_state.pop('editor_file', None)
 
                         st.success("✨ Changes saved successfully!")
                         st.info("📁 Previous version backed up with timestamp")
@@ -431,7 +493,7 @@ def manage_files_page():
                         st.error(f"Failed to refresh external table: {e}")
 
                 # Show current page info
-                st.caption(f"Showing rows {start_idx + 1} to {end_idx} of {len(df)}")
+                st.caption(f"Showing rows {start_idx + 1} to {end_idx} of {table.num_rows}")
 
         except Exception as e:
             st.error(f"Error loading file: {str(e)}")
@@ -446,70 +508,73 @@ class S3Handler:
     def upload_file(self, file_obj, filename):
         if hasattr(file_obj, 'seek'):
             file_obj.seek(0)
-        self.session.file.put_stream(file_obj, f"{self.stage}/{filename}", auto_compress=False, overwrite=True)
+        # Files over 64MB are split into chunks and staged concurrently across threads
+        self.session.file.put_stream(file_obj, f"{self.stage}/{filename}", parallel=10, auto_compress=False, overwrite=True)
         return f"{self.stage}/{filename}"
 
-    def get_file(self, filename, file_type="csv"):
-        if self.file_exists(filename):
-            with tempfile.TemporaryDirectory() as tmpdir:
-                self.session.file.get(f"{self.stage}/{filename}", tmpdir)
-                base_filename = os.path.basename(filename)
-                local_path = os.path.join(tmpdir, base_filename)
-                if file_type == "csv":
-                    return pd.read_csv(local_path)
-                elif file_type == "json":
-                    with open(local_path, 'r', encoding='utf-8') as f:
-                        return json.load(f)
-        else:
-            return None
+    def get_file(self, filename, file_type="csv", probe=False):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            # GET returns no results for a missing file, so no LIST is needed first
+            if not self.session.file.get(f"{self.stage}/{filename}", tmpdir):
+                return None
+            base_filename = os.path.basename(filename)
+            local_path = os.path.join(tmpdir, base_filename)
+            if file_type == "csv":
+                if probe:
+                    # The whole file is downloaded; only the first 2000 rows are parsed, as strings
+                    return pd.read_csv(local_path, nrows=2000, dtype=str)
+                # Arrow's reader types each column consistently, so the result converts to a pa.Table
+                df = pd.read_csv(local_path, engine="pyarrow")
+                if df.columns.has_duplicates:
+                    duplicate_cols = df.columns[df.columns.duplicated()].unique()
+                    raise ValueError(f"Duplicate columns found: {', '.join(map(str, duplicate_cols))}")
+                return df
+            elif file_type == "json":
+                with open(local_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
 
     def file_exists(self, filename):
         result = self.session.sql(f"LIST {self.stage}/{filename}").collect()
         return True if len(result) > 0 else False
 
-    def rename_file(self, old_name, new_name):
+    def backup_file(self, filename, backup_name):
+        """
+        Copy a file to backup_name within the stage server-side, without downloading it.
+        The original is left in place. Returns True if the backup was written.
+        """
         try:
-            df = self.get_file(old_name)
-    
-            # Create full path in temp dir with your chosen name
-            temp_dir = tempfile.gettempdir()
-            temp_path = os.path.join(temp_dir, new_name)
-
-            # Ensure the parent directory exists
-            os.makedirs(os.path.dirname(temp_path), exist_ok=True)
-            
-    
-            if new_name.endswith(".csv"):
-                df.to_csv(temp_path, index=False)
-            else:
-                raise ValueError("Unsupported file type")
-
+            self.session.sql(
+                f"COPY FILES INTO {self.stage}/ FROM (SELECT ?, ?)",
+                params=[f"{self.stage}/{filename}", backup_name]
+            ).collect()
+            return True
 
-            upload_path = os.path.dirname(new_name)
-    
-            self.session.file.put(
-                temp_path,
-                f"{self.stage}/{upload_path}",
-                auto_compress=False,
-                overwrite=True
-            )
-    
-            os.remove(temp_path)
-    
         except Exception as e:
-            st.error(f"Error renaming file: {str(e)}")
+            st.error(f"Error backing up file: {str(e)}")
+            return False
 
     def list_files(self, prefix=''):
         """List relative file paths in the S3 stage."""
+        return list(self.list_file_versions(prefix))
+
+    def list_file_versions(self, prefix=''):
+        """Map relative file paths in the S3 stage to their md5, from a single LIST."""
         try:
             files = self.session.sql(f"LIST {self.stage}/{prefix}").collect()
-            return [
-                file["name"].replace(self.stage_base_url, "").lstrip("/")
+            return {
+                file["name"].replace(self.stage_base_url, "").lstrip("/"): file["md5"]
                 for file in files
-            ]
+            }
         except Exception as e:
             st.error(f"Error listing files: {str(e)}")
-            return []
+            return {}
+
+
+def _get_s3() -> 'S3Handler':
+    """Return the S3Handler shared across reruns of this browser session."""
+    if 's3_handler' not in st.session_state:
+        st.session_state.s3_handler = S3Handler()
+    return st.session_state.s3_handler
 
 
 def load_data(filename):
@@ -525,43 +590,12 @@ def save_data(data, filename):
         json.dump(data, f, indent=2)
 
 
-def validate_dataframe(df: pd.DataFrame, schema: Dict) -> Tuple[bool, List[str]]:
+def validate_dataframe(df: pd.DataFrame, schema_columns: Dict[str, Dict]) -> Tuple[bool, List[str]]:
     """
     Validate DataFrame against schema definition.
     Returns (is_valid, list_of_issues)
     """
-    issues = []
-
-    # Check for schema compatibility
-    for col_name, col_info in schema['columns'].items():
-        # Check if required column exists
-        if col_name not in df.columns:
-            issues.append(f"Missing required column: {col_name}")
-            continue
-
-        # Get column data
-        col_data = df[col_name]
-
-        # Check nulls
-        if not col_info.get('nullable', False) and col_data.isnull().any():
-            issues.append(f"Column '{col_name}' contains null values which are not allowed")
-
-        # Validate data types
-        try:
-            if col_info['type'] == 'INTEGER':
-                non_null_data = col_data.dropna()
-                if not non_null_data.apply(lambda x: str(x).isdigit()).all():
-                    issues.append(f"Column '{col_name}' contains non-integer values")
-
-            elif col_info['type'] == 'FLOAT':
-                pd.to_numeric(col_data.dropna(), errors='raise')
-
-            elif col_info['type'] == 'DATETIME':
-                pd.to_datetime(col_data.dropna(), errors='raise')
-
-        except Exception as e:
-            issues.append(f"Data type validation failed for column '{col_name}': {str(e)}")
-
+    issues = _find_schema_issues(df, schema_columns, check_extra=False)
     return len(issues) == 0, issues
 
 